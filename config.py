@@ -1,2 +1,5 @@
 RPC_URL = "https://rpc.cardona.zkevm-rpc.com"
-CONTRACT_ADDRESS = "0x1a7dbe663E5efb9f3aAF2EB56616794069d3F4eA"
\ No newline at end of file
+CONTRACT_ADDRESS = "0x1a7dbe663E5efb9f3aAF2EB56616794069d3F4eA"
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+# Websocket endpoint for contract log subscriptions (None polls logs over RPC_URL)
+WSS_URL = None
\ No newline at end of file
@@ -1,15 +1,21 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from web3 import Web3
-from web3.exceptions import ContractLogicError
+from web3 import AsyncWeb3, AsyncHTTPProvider, WebsocketProviderV2
+from web3.middleware.exception_retry_request import async_exception_retry_middleware
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError, MethodUnavailable, TransactionNotFound
 from eth_account import Account
+from eth_utils import function_abi_to_4byte_selector, function_signature_to_4byte_selector
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
 import asyncio
-import threading
+import heapq
+import json
+import random
+import re
 import time
-from config import RPC_URL, CONTRACT_ADDRESS
+from config import RPC_URL, CONTRACT_ADDRESS, MULTICALL3_ADDRESS, WSS_URL
 
 class PrivateKeyUpdate(BaseModel):
     private_key: str
@@ -22,6 +28,9 @@ class BidSubmission(BaseModel):
 current_private_key = None
 current_account = None
 
+# 32-byte hex private key with optional 0x prefix
+PRIVATE_KEY_PATTERN = re.compile(r'(?:0x)?[0-9a-fA-F]{64}')
+
 def get_account():
     global current_account, current_private_key
     if current_private_key and not current_account:
@@ -33,36 +42,235 @@ def get_account():
             current_account = None
     return current_account
 
-def pop_if_ready():
-    """Trigger popIfReady contract function with error handling"""
+# Nonce tracked locally so back-to-back transactions never reuse one; the node's
+# 'pending' count is only read at startup, after a failed send or a key change.
+# Only correct within one process: startup.sh runs a single worker for this
+# (and so the scheduler and log watcher run once)
+nonce_lock = asyncio.Lock()
+nonce_counters = {}  # address -> next nonce, so a key change never inherits another account's count
+resync_needed = True
+# Bumped by reset_nonce; a 'pending' count fetched under an older generation is discarded
+nonce_generation = 0
+
+def nonce_stale(address):
+    """Whether the counter for address must be resynced from the node before use"""
+    return resync_needed or address not in nonce_counters
+
+def store_synced_nonce(address, pending_count, generation):
+    """Store a 'pending' count from the node unless reset_nonce ran since it was requested.
+
+    Callers must hold nonce_lock. Returns whether the count was stored.
+    """
+    global resync_needed
+    if generation != nonce_generation:
+        return False
+    nonce_counters[address] = pending_count
+    resync_needed = False
+    return True
+
+async def next_nonce(address):
+    """Return the next nonce for address, resyncing from the node only when flagged"""
+    async with nonce_lock:
+        while nonce_stale(address):
+            generation = nonce_generation
+            pending_count = await w3.eth.get_transaction_count(address, 'pending')
+            store_synced_nonce(address, pending_count, generation)
+        nonce = nonce_counters[address]
+        nonce_counters[address] = nonce + 1
+        return nonce
+
+def reset_nonce():
+    """Flag the local nonce as stale so the next transaction resyncs it from the node"""
+    global resync_needed, nonce_generation
+    resync_needed = True
+    nonce_generation += 1
+
+# Gas price cached for about half a block
+GAS_PRICE_TTL = 6
+gas_price_cache = (None, 0.0)  # (price in wei, time.monotonic() when fetched)
+
+def gas_price_expired():
+    """Whether the cached gas price is missing or older than GAS_PRICE_TTL"""
+    gas_price, fetched_at = gas_price_cache
+    return gas_price is None or time.monotonic() - fetched_at > GAS_PRICE_TTL
+
+async def get_gas_price():
+    """Return the node's gas price, refetching it at most every GAS_PRICE_TTL seconds"""
+    global gas_price_cache
+    if gas_price_expired():
+        gas_price_cache = (await w3.eth.gas_price, time.monotonic())
+    return gas_price_cache[0]
+
+# EIP-1559 fees sampled from eth_feeHistory in the background; None until the
+# first sample or after a failed one, and permanently None on chains without a base fee
+FEE_SAMPLE_INTERVAL = 30
+FEE_HISTORY_BLOCKS = 4
+fee_params = None  # {'maxFeePerGas': ..., 'maxPriorityFeePerGas': ...}
+fee_sampled_at = 0.0  # time.monotonic() of the sample behind fee_params
+# Caps older than this are ignored, since the base fee may have outgrown them
+FEE_PARAMS_MAX_AGE = 2 * FEE_SAMPLE_INTERVAL
+eip1559_supported = True
+
+async def sample_fees():
+    """Derive type-2 fee caps from the median priority fee of recent blocks"""
+    global fee_params, fee_sampled_at, eip1559_supported
+    try:
+        fee_history = await w3.eth.fee_history(FEE_HISTORY_BLOCKS, 'latest', [50])
+    except MethodUnavailable:
+        # Nodes without EIP-1559 may not implement eth_feeHistory at all
+        fee_history = {}
+    
+    # The last entry is the base fee of the next block
+    base_fee = fee_history['baseFeePerGas'][-1] if fee_history.get('baseFeePerGas') else 0
+    if not base_fee:
+        print("Chain reports no base fee - using legacy gas pricing")
+        eip1559_supported = False
+        fee_params = None
+        return
+    
+    rewards = [block_rewards[0] for block_rewards in fee_history.get('reward') or []]
+    priority_fee = sum(rewards) // len(rewards) if rewards else 0
+    fee_params = {
+        # Headroom for the base fee doubling before inclusion
+        'maxFeePerGas': 2 * base_fee + priority_fee,
+        'maxPriorityFeePerGas': priority_fee,
+    }
+    fee_sampled_at = time.monotonic()
+
+def current_fee_params():
+    """Return the sampled type-2 caps, or None if missing or older than FEE_PARAMS_MAX_AGE"""
+    if fee_params is None or time.monotonic() - fee_sampled_at > FEE_PARAMS_MAX_AGE:
+        return None
+    return fee_params
+
+async def get_fee_fields():
+    """Return the fee fields for a transaction: cached type-2 caps, else the legacy gas price"""
+    caps = current_fee_params()
+    if caps is not None:
+        return {'type': 2, **caps}
+    return {'gasPrice': await get_gas_price()}
+
+# Chain id fetched once and reused when building transactions
+chain_id = None
+
+async def get_chain_id():
+    """Return the chain id, asking the node only the first time"""
+    global chain_id
+    if chain_id is None:
+        chain_id = await w3.eth.chain_id
+    return chain_id
+
+# Gas limit used for every contract transaction
+TX_GAS_LIMIT = 200000
+
+async def send_contract_transaction(account, call_data, value=0):
+    """Sign and send a transaction to the contract with a locally reserved nonce.
+
+    The transaction dict is assembled directly from precomputed calldata rather
+    than through build_transaction, since gas, fees and chain id are known.
+    """
+    nonce = await next_nonce(account.address)
+    try:
+        transaction = {
+            'to': CONTRACT_ADDRESS,
+            'value': value,
+            'gas': TX_GAS_LIMIT,
+            **await get_fee_fields(),
+            'nonce': nonce,
+            'chainId': await get_chain_id(),
+            'data': call_data,
+        }
+        signed_txn = Account.sign_transaction(transaction, account.key)
+        return await w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+    except Exception:
+        # The reserved nonce was either never broadcast or rejected by the node
+        # ("nonce too low", "already known"), so resync before the next send
+        reset_nonce()
+        raise
+
+async def prefetch_send_context(address):
+    """Read the queue count and pop cooldown in one JSON-RPC batch with whatever send state is missing.
+
+    A stale legacy gas price, an unseeded nonce and an unknown chain id are
+    fetched in the same batch and stored in their caches, so the popIfReady
+    send that follows needs no reads. Returns (submission count, seconds until
+    the contract allows the next pop).
+    """
+    global chain_id, gas_price_cache
+    rpc_requests = [
+        contract_call_request('getSubmissionCount', []),
+        contract_call_request('getTimeUntilNextPop', [])
+    ]
+    need_chain_id = chain_id is None
+    if need_chain_id:
+        rpc_requests.append(("eth_chainId", []))
+    need_gas_price = current_fee_params() is None and gas_price_expired()
+    if need_gas_price:
+        rpc_requests.append(("eth_gasPrice", []))
+    need_nonce = nonce_stale(address)
+    generation = nonce_generation
+    if need_nonce:
+        rpc_requests.append(("eth_getTransactionCount", [address, "pending"]))
+    
+    try:
+        results = await rpc_batch(rpc_requests)
+    except Exception as e:
+        # Gas price and nonce are fetched on demand when the transaction is built
+        print(f"JSON-RPC batch failed, reading queue count directly: {e}")
+        return await asyncio.gather(
+            contract_functions['getSubmissionCount']().call(),
+            contract_functions['getTimeUntilNextPop']().call()
+        )
+    count_result, wait_result = results[0], results[1]
+    chain_id_result = results[2] if need_chain_id else None
+    gas_price_result = results[2 + need_chain_id] if need_gas_price else None
+    nonce_result = results[-1] if need_nonce else None
+    
+    if chain_id_result is not None:
+        chain_id = int(chain_id_result, 16)
+    if gas_price_result is not None:
+        gas_price_cache = (int(gas_price_result, 16), time.monotonic())
+    if nonce_result is not None:
+        async with nonce_lock:
+            if nonce_stale(address):
+                store_synced_nonce(address, int(nonce_result, 16), generation)
+    
+    if count_result is None or wait_result is None:
+        raise ValueError("getSubmissionCount or getTimeUntilNextPop failed in JSON-RPC batch")
+    return (
+        decode_result('getSubmissionCount', AsyncWeb3.to_bytes(hexstr=count_result)),
+        decode_result('getTimeUntilNextPop', AsyncWeb3.to_bytes(hexstr=wait_result))
+    )
+
+async def pop_if_ready():
+    """Trigger popIfReady contract function with error handling.
+
+    Returns the seconds left on the contract's cooldown when it is too early to
+    pop, so the scheduler retries once the cooldown ends instead of reverting.
+    """
     try:
         account = get_account()
         if not account:
             print("No account available for popIfReady transaction")
             return
         
-        # Check if queue is empty before attempting to pop
+        # Check if queue is empty or the cooldown is running before attempting to pop
         try:
-            submission_count = contract_instance.functions.getSubmissionCount().call()
+            submission_count, seconds_until_pop = await prefetch_send_context(account.address)
             if submission_count == 0:
                 print("Queue is empty - skipping popIfReady")
                 return
+            if seconds_until_pop > 0:
+                print(f"popIfReady not allowed for {seconds_until_pop}s - rescheduling")
+                return seconds_until_pop
         except Exception as e:
             print(f"Error checking queue count: {e}")
             # Continue with pop attempt if count check fails
         
-        # Build transaction
-        transaction = contract_instance.functions.popIfReady().build_transaction({
-            'from': account.address,
-            'gas': 200000,
-            'gasPrice': w3.eth.gas_price,
-            'nonce': w3.eth.get_transaction_count(account.address),
-        })
-        
         # Sign and send transaction
-        signed_txn = w3.eth.account.sign_transaction(transaction, private_key=current_private_key)
-        tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        tx_hash = await send_contract_transaction(account, POP_IF_READY_DATA)
         print(f"popIfReady transaction sent: {tx_hash.hex()}")
+        invalidate_block_cache()
         
     except ContractLogicError as e:
         if "3 minutes have not passed yet" in str(e):
@@ -72,11 +280,24 @@ def pop_if_ready():
     except Exception as e:
         print(f"Error calling popIfReady: {e}")
 
-def background_pop_task():
-    """Background task that runs every 3 minutes"""
-    while True:
-        pop_if_ready()
-        time.sleep(180)  # 3 minutes = 180 seconds
+# Seconds between popIfReady attempts (3 minutes)
+POP_INTERVAL = 180
+
+# Set on shutdown to stop the background tasks
+stop_event = asyncio.Event()
+background_tasks = []
+
+async def refresh_fees():
+    """Scheduler job refreshing EIP-1559 fee caps; returns False once the chain is legacy-only"""
+    global fee_params
+    try:
+        await sample_fees()
+    except Exception as e:
+        # Drop the old caps so sends fall back to the legacy gas price until
+        # a sample succeeds, rather than reusing caps the base fee may outgrow
+        fee_params = None
+        print(f"Error sampling fee history: {e}")
+    return eip1559_supported
 
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
@@ -84,40 +305,443 @@ templates = Jinja2Templates(directory="templates")
 # Mount static files FIRST
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Web3 setup
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
+# Web3 setup (the keep-alive session is attached on startup)
+w3 = AsyncWeb3(AsyncHTTPProvider(RPC_URL, request_kwargs={"timeout": ClientTimeout(total=5)}))
+rpc_session = None
+
+# Drop the default middlewares: validation re-probes eth_chainId on every call and
+# the others (ENS names, gas strategy/estimates, attrdict) are unused, so each
+# contract read stays a single RPC
+w3.middleware_onion.clear()
+
+# Connection pool shared by every RPC in this process
+RPC_POOL_SIZE = 100
+RPC_KEEPALIVE_TIMEOUT = 60
+
+async def rpc_retry_middleware(make_request, async_w3):
+    """Retry read-only RPCs up to twice, 0.1 s apart, on connection errors and timeouts"""
+    return await async_exception_retry_middleware(
+        make_request,
+        async_w3,
+        (TimeoutError, ClientError),
+        retries=3,
+        backoff_factor=0.1
+    )
+
+# Replaces the provider's default of five attempts 0.3 s apart, which could
+# hold a request for 25 s with the 5 s timeout when the node is down
+w3.provider.middlewares = [rpc_retry_middleware]
 
 # Contract setup
 with open('contract.abi', 'r') as f:
-    abi = f.read()
+    abi = json.load(f)
 contract_instance = w3.eth.contract(address=CONTRACT_ADDRESS, abi=abi)
 
-# Start background tasks
-pop_thread = threading.Thread(target=background_pop_task, daemon=True)
-pop_thread.start()
-print("Background popIfReady task started")
+# Contract function handles resolved once and reused by the batched reads
+contract_functions = {
+    fn_name: contract_instance.get_function_by_name(fn_name)
+    for fn_name in ('getSubmissionCount', 'getSubmissionByIndex', 'getSubmitterByIndex', 'getTimestampByIndex', 'getTimeUntilNextPop')
+}
+
+# Selectors and output types of the batched reads, precomputed so encoding and
+# decoding them needs no ABI reflection
+READ_SELECTORS = {
+    fn_name: function_abi_to_4byte_selector(fn.abi) for fn_name, fn in contract_functions.items()
+}
+READ_OUTPUT_TYPES = {
+    fn_name: [output['type'] for output in fn.abi['outputs']] for fn_name, fn in contract_functions.items()
+}
+
+def encode_read(fn_name, args):
+    """Calldata for a batched read; these functions only take uint256 arguments"""
+    return READ_SELECTORS[fn_name] + b''.join(arg.to_bytes(32, 'big') for arg in args)
+
+# Transaction calldata templates: popIfReady takes no arguments, so its calldata
+# never changes, and submitData only needs its url argument encoded per bid
+POP_IF_READY_DATA = contract_instance.encodeABI(fn_name='popIfReady')
+SUBMIT_DATA_SELECTOR = function_signature_to_4byte_selector('submitData(string)')
+
+# Multicall3 setup (batches contract reads into a single eth_call)
+with open('multicall3.abi', 'r') as f:
+    multicall_abi = json.load(f)
+multicall_instance = w3.eth.contract(address=MULTICALL3_ADDRESS, abi=multicall_abi)
+
+# Number of queue entries exposed by /queue-metadata
+QUEUE_PREVIEW_SIZE = 5
+
+def decode_result(fn_name, return_data):
+    """Decode raw return data of a contract function, unwrapping single outputs"""
+    decoded = w3.codec.decode(READ_OUTPUT_TYPES[fn_name], return_data)
+    return decoded[0] if len(decoded) == 1 else decoded
+
+async def multicall_read(calls):
+    """Execute (fn_name, args) contract reads in one Multicall3 tryAggregate call.
+
+    Returns decoded results in call order, with None for calls that reverted.
+    """
+    encoded_calls = [
+        (CONTRACT_ADDRESS, encode_read(fn_name, args))
+        for fn_name, args in calls
+    ]
+    results = await multicall_instance.functions.tryAggregate(False, encoded_calls).call()
+    return [
+        decode_result(fn_name, return_data) if success else None
+        for (fn_name, _), (success, return_data) in zip(calls, results)
+    ]
+
+async def rpc_batch(rpc_requests):
+    """Send (method, params) JSON-RPC requests as a single batch POST.
+
+    Returns the raw results in request order, with None for requests that errored.
+    """
+    payload = [
+        {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        for request_id, (method, params) in enumerate(rpc_requests)
+    ]
+    async with rpc_session.post(RPC_URL, json=payload, timeout=ClientTimeout(total=10)) as response:
+        responses = await response.json(content_type=None)
+    if not isinstance(responses, list):
+        # Providers with batching disabled reply with a single error object
+        raise ValueError(f"JSON-RPC batch rejected: {responses.get('error')}")
+    
+    by_id = {item.get("id"): item for item in responses}
+    return [by_id.get(request_id, {}).get("result") for request_id in range(len(rpc_requests))]
+
+def contract_call_request(fn_name, args):
+    """Build the (method, params) eth_call request for a contract read"""
+    call_data = '0x' + encode_read(fn_name, args).hex()
+    return ("eth_call", [{"to": CONTRACT_ADDRESS, "data": call_data}, "latest"])
+
+async def batch_read(calls):
+    """Execute (fn_name, args) contract reads as a single JSON-RPC batch POST.
+
+    Returns decoded results in call order, with None for calls that errored.
+    """
+    results = await rpc_batch([contract_call_request(fn_name, args) for fn_name, args in calls])
+    return [
+        None if result is None else decode_result(fn_name, AsyncWeb3.to_bytes(hexstr=result))
+        for (fn_name, _), result in zip(calls, results)
+    ]
+
+# Cleared once the chain turns out to have no Multicall3 deployment
+multicall_supported = True
+
+async def batched_read(calls):
+    """Read (fn_name, args) contract calls in one round-trip.
+
+    Uses Multicall3 where deployed, otherwise a JSON-RPC batch. If both fail,
+    every entry is None so callers fall back to per-call reads.
+    """
+    global multicall_supported
+    if multicall_supported:
+        try:
+            return await multicall_read(calls)
+        except BadFunctionCallOutput as e:
+            print(f"Multicall3 not available on this chain, using JSON-RPC batches: {e}")
+            multicall_supported = False
+        except Exception as e:
+            print(f"Multicall read failed, trying JSON-RPC batch: {e}")
+    
+    try:
+        return await batch_read(calls)
+    except Exception as e:
+        print(f"JSON-RPC batch failed, falling back to per-call reads: {e}")
+        return [None] * len(calls)
+
+async def fetch_current_url():
+    """Get current song URL directly from contract"""
+    return (await contract_instance.functions.getCurrentSong().call())[0]
+
+async def fetch_queue_metadata():
+    """Collect queue count, current/next entries and recent submissions"""
+    # Read the count and every preview field in a single round-trip.
+    # Indices past the end of the queue revert and are simply ignored.
+    calls = [('getSubmissionCount', [])]
+    for i in range(QUEUE_PREVIEW_SIZE):
+        calls.append(('getSubmissionByIndex', [i]))
+        calls.append(('getSubmitterByIndex', [i]))
+        calls.append(('getTimestampByIndex', [i]))
+    
+    results = await batched_read(calls)
+    
+    async def read(position):
+        """Return a batched result, re-fetching it directly if the batch entry failed"""
+        if results[position] is None:
+            fn_name, args = calls[position]
+            results[position] = await contract_functions[fn_name](*args).call()
+        return results[position]
+    
+    # Get total submission count
+    total_count = await read(0)
+    
+    queue_data = {
+        "total_count": total_count,
+        "current_playing": None,
+        "coming_up_next": None,
+        "recent_submissions": []
+    }
+    
+    # Get recent submissions (up to 5 items)
+    recent_count = min(total_count, QUEUE_PREVIEW_SIZE)
+    for i in range(recent_count):
+        try:
+            position = 1 + i * 3
+            url = (await read(position))[0]
+            submitter = AsyncWeb3.to_checksum_address(await read(position + 1))
+            timestamp = await read(position + 2)
+            
+            queue_data["recent_submissions"].append({
+                "index": i,
+                "url": url,
+                "submitter": submitter,
+                "timestamp": timestamp
+            })
+        except Exception as e:
+            print(f"Error getting submission {i} metadata: {e}")
+    
+    # Current playing (index 0) and coming up next (index 1) come from the same reads
+    slots = {0: "current_playing", 1: "coming_up_next"}
+    for submission in queue_data["recent_submissions"]:
+        if submission["index"] not in slots:
+            continue
+        queue_data[slots[submission["index"]]] = {
+            "url": submission["url"],
+            "submitter": submission["submitter"],
+            "timestamp": submission["timestamp"]
+        }
+    
+    return queue_data
+
+# Contract reads cached for the block they were fetched at
+block_cache = {"block": None}
+# Fetches in progress keyed by (key, block_number), shared by concurrent callers
+inflight_reads = {}
+
+def finish_read(inflight_key, task):
+    """Store a finished fetch in the block cache if its block is still current"""
+    inflight_reads.pop(inflight_key, None)
+    key, block_number = inflight_key
+    # Checking exception() also marks it retrieved when every waiter has gone
+    if not task.cancelled() and task.exception() is None and block_cache["block"] == block_number:
+        block_cache[key] = task.result()
+
+# eth_blockNumber lookup in progress, shared by concurrent cached_read callers
+inflight_block_number = None
+
+async def current_block_number():
+    """Return the latest block number, joining a lookup already in flight"""
+    global inflight_block_number
+    if inflight_block_number is None:
+        inflight_block_number = asyncio.ensure_future(w3.eth.block_number)
+        inflight_block_number.add_done_callback(clear_block_number_lookup)
+    return await asyncio.shield(inflight_block_number)
+
+def clear_block_number_lookup(task):
+    """Let the next caller start a fresh lookup once this one finishes"""
+    global inflight_block_number
+    inflight_block_number = None
+    if not task.cancelled():
+        task.exception()
+
+async def cached_read(key, fetch):
+    """Return the cached value for key if fetched at the current block, else refetch it.
+
+    Concurrent callers in the same block await one shared fetch instead of each
+    sending their own RPCs.
+    """
+    block_number = await current_block_number()
+    if block_cache["block"] != block_number:
+        block_cache.clear()
+        block_cache["block"] = block_number
+    if key in block_cache:
+        return block_cache[key]
+    
+    inflight_key = (key, block_number)
+    task = inflight_reads.get(inflight_key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        inflight_reads[inflight_key] = task
+        task.add_done_callback(lambda done: finish_read(inflight_key, done))
+    # A disconnecting client must not cancel the fetch other callers are waiting on
+    return await asyncio.shield(task)
+
+def invalidate_block_cache():
+    """Drop all cached reads so the next request refetches from the chain"""
+    block_cache["block"] = None
+
+# Queues of browsers connected to /events
+event_subscribers = set()
+
+# Seconds before an /events stream closes and the browser reconnects
+EVENT_STREAM_LIFETIME = 60
+EVENT_KEEPALIVE_INTERVAL = 15
+EVENT_RETRY_MS = 1000  # reconnect delay sent to EventSource
+
+# Seconds between eth_getLogs checks when no websocket endpoint is configured
+LOG_POLL_INTERVAL = 5
+
+async def publish_contract_update():
+    """Refresh the cached current URL after a contract event and push it to /events listeners"""
+    invalidate_block_cache()
+    try:
+        url = await cached_read("current_url", fetch_current_url)
+    except Exception as e:
+        # getCurrentSong reverts once the queue is empty
+        print(f"Error reading current song after contract event: {e}")
+        url = None
+    
+    message = json.dumps({"url": url if url else None})
+    for subscriber in event_subscribers:
+        subscriber.put_nowait(message)
+
+async def watch_logs_websocket():
+    """Subscribe to contract logs over WSS_URL and publish an update for each one"""
+    async with AsyncWeb3.persistent_websocket(WebsocketProviderV2(WSS_URL)) as ws_w3:
+        await ws_w3.eth.subscribe("logs", {"address": CONTRACT_ADDRESS})
+        print("Subscribed to contract logs over websocket")
+        async for _ in ws_w3.ws.listen_to_websocket():
+            await publish_contract_update()
+
+# Next block to check for contract logs over HTTP (None until the first check)
+log_from_block = None
+# Most blocks asked for in one eth_getLogs call
+MAX_LOG_RANGE = 1000
+
+async def check_new_logs():
+    """Scheduler job checking new blocks for contract logs over HTTP and publishing an update"""
+    global log_from_block
+    latest_block = await w3.eth.block_number
+    if log_from_block is None:
+        log_from_block = latest_block + 1
+        return
+    if latest_block >= log_from_block:
+        # Bounded so catching up after an outage stays within provider range limits
+        to_block = min(latest_block, log_from_block + MAX_LOG_RANGE - 1)
+        logs = await w3.eth.get_logs({
+            "address": CONTRACT_ADDRESS,
+            "fromBlock": log_from_block,
+            "toBlock": to_block
+        })
+        log_from_block = to_block + 1
+        if logs:
+            await publish_contract_update()
+
+async def background_log_watch_task():
+    """Background task pushing contract events from WSS_URL to /events, reconnecting on errors"""
+    while not stop_event.is_set():
+        try:
+            await watch_logs_websocket()
+        except Exception as e:
+            print(f"Error watching contract logs: {e}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=LOG_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+# Seconds of random spread around each job deadline so RPC bursts don't line up
+SCHEDULER_JITTER = 5
+LOG_POLL_JITTER = 0.5
+
+async def background_scheduler_task(jobs):
+    """Run (interval, (min_jitter, max_jitter), job) entries from one task using a min-heap of deadlines.
+
+    A job that returns False is dropped from the schedule; one that returns a
+    number of seconds runs again after that delay instead of its interval.
+    """
+    now = time.monotonic()
+    deadlines = [(now + random.uniform(0, max_jitter), index) for index, (_, (_, max_jitter), _) in enumerate(jobs)]
+    heapq.heapify(deadlines)
+    while deadlines and not stop_event.is_set():
+        deadline, index = deadlines[0]
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        heapq.heappop(deadlines)
+        interval, (min_jitter, max_jitter), job = jobs[index]
+        try:
+            result = await job()
+        except Exception as e:
+            print(f"Error in background job {job.__name__}: {e}")
+            result = None
+        if result is False:
+            continue
+        if isinstance(result, (int, float)) and not isinstance(result, bool):
+            interval = result
+        next_deadline = time.monotonic() + interval + random.uniform(min_jitter, max_jitter)
+        heapq.heappush(deadlines, (next_deadline, index))
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # One pooled keep-alive session shared by the provider and JSON-RPC batches
+    global rpc_session
+    rpc_session = ClientSession(
+        connector=TCPConnector(
+            limit=RPC_POOL_SIZE,
+            limit_per_host=RPC_POOL_SIZE,
+            keepalive_timeout=RPC_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300
+        ),
+        raise_for_status=True
+    )
+    await w3.provider.cache_async_session(rpc_session)
+    jobs = [
+        # Pops only ever run late: early ones revert against the on-chain cooldown
+        (POP_INTERVAL, (0, SCHEDULER_JITTER), pop_if_ready),
+        (FEE_SAMPLE_INTERVAL, (-SCHEDULER_JITTER, SCHEDULER_JITTER), refresh_fees)
+    ]
+    if WSS_URL:
+        background_tasks.append(asyncio.create_task(background_log_watch_task()))
+        print("Background contract log watcher started")
+    else:
+        jobs.append((LOG_POLL_INTERVAL, (-LOG_POLL_JITTER, LOG_POLL_JITTER), check_new_logs))
+    background_tasks.append(asyncio.create_task(background_scheduler_task(jobs)))
+    print("Background scheduler started")
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    stop_event.set()
+    # Loops exit at their next stop_event check; an open websocket stream is cancelled
+    _, pending = await asyncio.wait(background_tasks, timeout=5)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    await rpc_session.close()
+    print("Background tasks stopped")
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+# Connection status for /health, probed at most every CONNECTION_CHECK_TTL seconds
+CONNECTION_CHECK_TTL = 30
+connection_check = (False, None)  # (connected, time.monotonic() when probed)
+
+async def is_blockchain_connected():
+    """Return the cached is_connected() result, re-probing the node once it expires"""
+    global connection_check
+    connected, checked_at = connection_check
+    if checked_at is None or time.monotonic() - checked_at > CONNECTION_CHECK_TTL:
+        connected = await w3.is_connected()
+        connection_check = (connected, time.monotonic())
+    return connected
+
 @app.get("/health")
 async def health_check():
     """Simple health check endpoint"""
     return {
         "status": "healthy",
-        "blockchain_connected": w3.is_connected(),
+        "blockchain_connected": await is_blockchain_connected(),
         "contract_address": CONTRACT_ADDRESS
     }
 
 @app.get("/current-url")
 async def get_current_url():
     try:
-        if not w3.is_connected():
-            return {"error": "Blockchain connection failed"}
-        
-        # Get current song URL directly from contract
-        url = contract_instance.functions.getCurrentSong().call()[0]
+        url = await cached_read("current_url", fetch_current_url)
         return {"url": url if url else None}
     
     except Exception as e:
@@ -126,71 +750,36 @@ async def get_current_url():
 @app.get("/queue-metadata")
 async def get_queue_metadata():
     try:
-        if not w3.is_connected():
-            return {"error": "Blockchain connection failed"}
-        
-        # Get total submission count
-        total_count = contract_instance.functions.getSubmissionCount().call()
-        
-        queue_data = {
-            "total_count": total_count,
-            "current_playing": None,
-            "coming_up_next": None,
-            "recent_submissions": []
-        }
-        
-        if total_count > 0:
-            # Get current playing metadata (index 0)
-            try:
-                current_url = contract_instance.functions.getSubmissionByIndex(0).call()[0]
-                current_submitter = contract_instance.functions.getSubmitterByIndex(0).call()
-                current_timestamp = contract_instance.functions.getTimestampByIndex(0).call()
-                
-                queue_data["current_playing"] = {
-                    "url": current_url,
-                    "submitter": current_submitter,
-                    "timestamp": current_timestamp
-                }
-            except Exception as e:
-                print(f"Error getting current playing metadata: {e}")
-        
-        if total_count > 1:
-            # Get coming up next (index 1)
-            try:
-                next_url = contract_instance.functions.getSubmissionByIndex(1).call()[0]
-                next_submitter = contract_instance.functions.getSubmitterByIndex(1).call()
-                next_timestamp = contract_instance.functions.getTimestampByIndex(1).call()
-                
-                queue_data["coming_up_next"] = {
-                    "url": next_url,
-                    "submitter": next_submitter,
-                    "timestamp": next_timestamp
-                }
-            except Exception as e:
-                print(f"Error getting next submission metadata: {e}")
-        
-        # Get recent submissions (up to 5 items)
-        recent_count = min(total_count, 5)
-        for i in range(recent_count):
-            try:
-                url = contract_instance.functions.getSubmissionByIndex(i).call()[0]
-                submitter = contract_instance.functions.getSubmitterByIndex(i).call()
-                timestamp = contract_instance.functions.getTimestampByIndex(i).call()
-                
-                queue_data["recent_submissions"].append({
-                    "index": i,
-                    "url": url,
-                    "submitter": submitter,
-                    "timestamp": timestamp
-                })
-            except Exception as e:
-                print(f"Error getting submission {i} metadata: {e}")
-        
-        return queue_data
+        # Queue contents only change between blocks, so repeat reads are served from cache
+        return await cached_read("queue", fetch_queue_metadata)
     
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/events")
+async def stream_events():
+    """Server-sent events carrying the current URL whenever the contract emits a log"""
+    subscriber = asyncio.Queue()
+    event_subscribers.add(subscriber)
+    
+    async def event_stream():
+        # Streams end on their own so an open tab never blocks a graceful restart;
+        # EventSource reconnects after the retry delay and catches up in onopen
+        closes_at = time.monotonic() + EVENT_STREAM_LIFETIME
+        try:
+            yield f"retry: {EVENT_RETRY_MS}\n\n"
+            while (remaining := closes_at - time.monotonic()) > 0:
+                try:
+                    message = await asyncio.wait_for(subscriber.get(), timeout=min(EVENT_KEEPALIVE_INTERVAL, remaining))
+                    yield f"data: {message}\n\n"
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+        finally:
+            event_subscribers.discard(subscriber)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.get("/account-info")
 async def get_account_info():
     try:
@@ -215,48 +804,60 @@ async def submit_bid(data: BidSubmission):
         if not account:
             return {"error": "No account available - please enter private key first"}
         
-        # Build transaction
-        transaction = contract_instance.functions.submitData(data.url).build_transaction({
-            'from': account.address,
-            'value': data.value,
-            'gas': 200000,
-            'gasPrice': w3.eth.gas_price,
-            'nonce': w3.eth.get_transaction_count(account.address)
-        })
-        
-        # Sign and send the transaction
-        signed_txn = w3.eth.account.sign_transaction(transaction, private_key=current_private_key)
-        tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        # Sign and send the transaction; only the url argument needs encoding per bid
+        call_data = SUBMIT_DATA_SELECTOR + w3.codec.encode(['string'], [data.url])
+        tx_hash = await send_contract_transaction(account, call_data, value=data.value)
         
         print(f"Bid submitted - Transaction hash: {tx_hash.hex()}")
         
-        # Wait for transaction receipt
-        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-        print(f"Transaction confirmed in block {tx_receipt.blockNumber}")
-        
+        # Return without waiting for the block; the frontend polls /tx-status
         return {
             "success": True,
             "tx_hash": tx_hash.hex(),
-            "block_number": tx_receipt.blockNumber
+            "pending": True
         }
         
     except Exception as e:
         print(f"Error submitting bid: {e}")
         return {"error": str(e)}
 
+@app.get("/tx-status/{tx_hash}")
+async def get_tx_status(tx_hash: str):
+    try:
+        tx_receipt = await w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        # Not mined yet
+        return {"tx_hash": tx_hash, "pending": True}
+    except Exception as e:
+        return {"error": str(e)}
+    
+    return {
+        "tx_hash": tx_hash,
+        "pending": False,
+        "success": tx_receipt['status'] == 1,
+        "block_number": tx_receipt['blockNumber']
+    }
+
 @app.post("/update-private-key")
 async def update_private_key(data: PrivateKeyUpdate):
     try:
         global current_private_key, current_account
-        current_private_key = data.private_key.strip()
+        private_key = data.private_key.strip()
+        current_private_key = None
         current_account = None  # Reset account to force recreation
+        reset_nonce()  # Nonces belong to the previous account
+        
+        # Check private key format
+        if not PRIVATE_KEY_PATTERN.fullmatch(private_key):
+            clean_key = private_key.removeprefix('0x')
+            if len(clean_key) != 64:
+                return {"error": f"Private key must be 64 hex characters, got {len(clean_key)} characters"}
+            return {"error": "Private key must contain only hex characters (0-9, a-f)"}
         
-        # Check private key length
-        clean_key = current_private_key.replace('0x', '')
-        if len(clean_key) != 64:
-            return {"error": f"Private key must be 64 hex characters, got {len(clean_key)} characters"}
+        # Keep the raw key bytes so deriving the account skips hex decoding
+        current_private_key = bytes.fromhex(private_key.removeprefix('0x'))
         
-        # Try to create account immediately
+        # Derive the account once; get_account and sends reuse current_account
         current_account = Account.from_key(current_private_key)
         print(f"Account created successfully: {current_account.address}")
         return {"success": True, "address": current_account.address}
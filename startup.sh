@@ -1 +1 @@
-gunicorn -w 4 -k uvicorn.workers.UvicornWorker main:app
\ No newline at end of file
+gunicorn -w 1 -k uvicorn.workers.UvicornWorker main:app
\ No newline at end of file